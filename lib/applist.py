@@ -91,11 +91,9 @@ class AppListFormatter(object):
         extensions = {}
         for ref in self.refs:
             for related in ref.related:
-                related_ref = related.format_ref()
-
                 if related.get_kind() == Flatpak.RefKind.APP:
-                    raise ValueError('Ref', ref.ref, 'has app', related_ref,
-                                     'as related ref')
+                    raise ValueError('Ref', ref.ref, 'has app',
+                                     related.format_ref(), 'as related ref')
 
                 # It's possible for a possible for a "real" runtime to also be
                 # used an extension. eg app/com.endlessm.EknServicesMultiplexer
@@ -108,6 +106,7 @@ class AppListFormatter(object):
                 if not related.should_download():
                     continue
 
+                related_ref = related.format_ref()
                 if related_ref not in self.full_refs:
                     continue
 
@@ -310,11 +310,11 @@ class ImageConfigParser(configparser.ConfigParser):
 
     def get_environment(self):
         """Get all environment variables for configuration"""
-        return dict([
+        return dict(
             self.getenv(sect, opt)
             for sect in self.sections()
             for opt in self.options(sect)
-        ])
+        )
 
 
 def recreate_dir(path):
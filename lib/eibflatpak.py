@@ -21,15 +21,17 @@
 import base64
 import codecs
 from collections import namedtuple, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from configparser import ConfigParser
 from contextlib import contextmanager
 import eib
 from eibostree import fetch_remote_collection_id
-import fnmatch
+from functools import lru_cache
 from gi import require_version
 import logging
 import os
 import sys
+import time
 from urllib.parse import urlparse
 from urllib.request import urlopen
 
@@ -45,6 +47,51 @@ class FlatpakError(eib.ImageBuildError):
     pass
 
 
+def _keyfile_missing(err):
+    """Whether a GLib error is for a missing key file group or key"""
+    return (
+        err.matches(GLib.KeyFile.error_quark(),
+                    GLib.KeyFileError.GROUP_NOT_FOUND) or
+        err.matches(GLib.KeyFile.error_quark(),
+                    GLib.KeyFileError.KEY_NOT_FOUND)
+    )
+
+
+# Values used from a flatpakrepo file
+FlatpakRepoConfig = namedtuple('FlatpakRepoConfig', (
+    'url', 'title', 'default_branch', 'gpg_key'))
+
+
+@lru_cache(maxsize=32)
+def _get_repo_config(repo_file):
+    """Download and parse the repo config file
+
+    The result is cached by repo_file so that remotes sharing a repo
+    file only fetch it once.
+    """
+    config = ConfigParser()
+
+    parts = urlparse(repo_file)
+    if not parts.scheme or parts.scheme == 'file':
+        logger.info('Loading repo file %s', repo_file)
+        if not config.read(parts.path, encoding='utf-8'):
+            raise FlatpakError('Could not read repo file', repo_file)
+    else:
+        logger.info('Downloading repo file %s', repo_file)
+        with urlopen(repo_file) as resp:
+            # ConfigParser likes text, so decode from utf-8
+            config.read_file(codecs.getreader('utf-8')(resp),
+                             source=repo_file)
+
+    group = FlatpakRemote.FLATPAK_REPO_GROUP
+    return FlatpakRepoConfig(
+        url=config.get(group, 'Url', fallback=None),
+        title=config.get(group, 'Title', fallback=None),
+        default_branch=config.get(group, 'DefaultBranch', fallback=None),
+        gpg_key=config.get(group, 'GPGKey', fallback=None),
+    )
+
+
 class FlatpakFullRef(namedtuple('FlatpakFullRef', (
         'remote', 'remote_ref', 'installed_size', 'download_size', 'metadata',
         'related'))):
@@ -95,16 +142,14 @@ class FlatpakFullRef(namedtuple('FlatpakFullRef', (
             section = 'Application'
         elif (
             self.has_extra_data and
-            not self.metadata.getboolean('Extra Data', 'NoRuntime',
-                                         fallback=False)
+            not self._get_metadata_boolean('Extra Data', 'NoRuntime')
         ):
             section = 'ExtensionOf'
         else:
             return None
 
-        runtime = self.metadata.get(section, 'runtime', fallback=None)
-        if runtime is not None:
-            runtime = 'runtime/' + runtime
+        if self._has_metadata_key(section, 'runtime'):
+            runtime = 'runtime/' + self.metadata.get_string(section, 'runtime')
             # Make sure the runtime specified in the metadata isn't this
             # flatpak itself.
             if runtime != self.ref:
@@ -112,7 +157,23 @@ class FlatpakFullRef(namedtuple('FlatpakFullRef', (
 
     @property
     def has_extra_data(self):
-        return 'Extra Data' in self.metadata
+        return self.metadata.has_group('Extra Data')
+
+    def _has_metadata_key(self, group, key):
+        # GKeyFile.has_key() isn't introspectable, so check by getting
+        # the raw value and ignoring missing group or key errors.
+        try:
+            self.metadata.get_value(group, key)
+        except GLib.Error as err:
+            if _keyfile_missing(err):
+                return False
+            raise
+        return True
+
+    def _get_metadata_boolean(self, group, key, fallback=False):
+        if not self._has_metadata_key(group, key):
+            return fallback
+        return self.metadata.get_boolean(group, key)
 
 
 class FlatpakRemote(object):
@@ -132,9 +193,6 @@ class FlatpakRemote(object):
     # Group used in flatpakrepo files
     FLATPAK_REPO_GROUP = 'Flatpak Repo'
 
-    # Convenience for decoding from utf-8 from open file
-    UTF8_READER = codecs.getreader('utf-8')
-
     def __init__(self, manager, name, url=None, deploy_url=None,
                  repo_file=None, apps=None, runtimes=None, exclude=None,
                  allow_extra_data=None, title=None, default_branch=None,
@@ -161,27 +219,30 @@ class FlatpakRemote(object):
 
         # Only supported from repo_file
         self.gpg_key = None
+        self.gpg_key_bytes = None
 
         # Fetch repo_file if specified
         if self.repo_file:
-            repo_config = self._get_repo_config()
+            repo_config = _get_repo_config(self.repo_file)
 
             # Get URL, title and default branch if not specified in
             # configuration
             if not self.url:
-                self.url = repo_config.get(self.FLATPAK_REPO_GROUP,
-                                           'Url', fallback=None)
+                self.url = repo_config.url
             if not self.title:
-                self.title = repo_config.get(self.FLATPAK_REPO_GROUP,
-                                             'Title', fallback=None)
+                self.title = repo_config.title
             if not self.default_branch:
-                self.default_branch = repo_config.get(
-                    self.FLATPAK_REPO_GROUP, 'DefaultBranch',
-                    fallback=None)
+                self.default_branch = repo_config.default_branch
 
             # Get the base64 encoded GPG key
-            self.gpg_key = repo_config.get(self.FLATPAK_REPO_GROUP,
-                                           'GPGKey', fallback=None)
+            self.gpg_key = repo_config.gpg_key
+
+            # Strip any whitespace, decode from base64 and convert to
+            # GBytes once so that the key is validated up front
+            if self.gpg_key:
+                gpg_key_decoded = base64.b64decode(self.gpg_key.strip(),
+                                                   validate=True)
+                self.gpg_key_bytes = GLib.Bytes.new(gpg_key_decoded)
 
         # Make sure URL configured
         if not self.url:
@@ -193,25 +254,7 @@ class FlatpakRemote(object):
 
         # Calculated values
         self.refs = {}
-
-    def _get_repo_config(self):
-        """Download and parse the repo config file"""
-        config = ConfigParser()
-
-        parts = urlparse(self.repo_file)
-        if not parts.scheme or parts.scheme == 'file':
-            logger.info('Loading repo file %s', self.repo_file)
-            if not config.read(parts.path, encoding='utf-8'):
-                raise FlatpakError('Could not read repo file',
-                                   self.repo_file)
-        else:
-            logger.info('Downloading repo file %s', self.repo_file)
-            with urlopen(self.repo_file) as resp:
-                # ConfigParser likes text, so decode from utf-8
-                config.read_file(self.UTF8_READER(resp),
-                                 source=self.repo_file)
-
-        return config
+        self._branches = {}
 
     def add(self):
         """Add this remote to the installation"""
@@ -228,14 +271,8 @@ class FlatpakRemote(object):
             remote.set_prio(self.prio)
 
         # Import the GPG key if specified
-        if self.gpg_key:
-            # Strip any whitespace and decode from base64
-            gpg_key_decoded = base64.b64decode(self.gpg_key.strip(),
-                                               validate=True)
-
-            # Convert to GBytes
-            gpg_key_bytes = GLib.Bytes.new(gpg_key_decoded)
-            remote.set_gpg_key(gpg_key_bytes)
+        if self.gpg_key_bytes:
+            remote.set_gpg_key(self.gpg_key_bytes)
 
         # Recent flatpak began automatically adding collection IDs in
         # certain scenarios, but once they're set they can't change.
@@ -366,51 +403,65 @@ class FlatpakRemote(object):
         logger.info('Fetching refs for %s', self.name)
         all_remote_refs = eib.retry(
             self.installation.list_remote_refs_sync, self.name)
+
         for remote_ref in all_remote_refs:
-            # Get the full ostree ref
-            ref = remote_ref.format_ref()
-            logger.debug('Found %s ref %s', self.name, ref)
-
-            # Get the installed and download size
-            _, download_size, installed_size = eib.retry(
-                self.installation.fetch_remote_size_sync, self.name,
-                remote_ref)
-
-            # Try to get the runtime and sdk from the flatpak metadata.
-            # We could use GKeyFile as the INI parser, but ConfigParser
-            # is more pleasant from python.
-            #
-            # We disable strict parsing so that it doesn't error on
-            # duplicate sections or options, which flatpak-builder
-            # apparently generates sometimes
-            # (https://phabricator.endlessm.com/T22435).
-            metadata_bytes = eib.retry(
-                self.installation.fetch_remote_metadata_sync, self.name,
-                remote_ref)
-            metadata_str = metadata_bytes.get_data().decode('utf-8')
-            metadata = ConfigParser(strict=False)
-            try:
-                metadata.read_string(metadata_str)
-            except:  # noqa: E722
-                print('Could not read {} {} metadata:\n{}'
-                      .format(self.name, ref, metadata_str),
-                      file=sys.stderr)
-                raise
-
-            # Get all the related refs
-            logger.debug('Getting related refs for %s ref %s',
-                         self.name, ref)
-            related = eib.retry(
-                self.installation.list_remote_related_refs_sync,
-                self.name, ref)
-
-            # Create FlatpakFullRef
-            self.refs[ref] = FlatpakFullRef(remote=self,
-                                            remote_ref=remote_ref,
-                                            installed_size=installed_size,
-                                            download_size=download_size,
-                                            metadata=metadata,
-                                            related=related)
+            full_ref = self._get_full_ref(remote_ref)
+            self.refs[full_ref.ref] = full_ref
+
+        # Index the sorted branches for each kind, name and arch so that
+        # the latest branch can be matched without scanning all refs.
+        self._branches = {}
+        for ref in self.refs:
+            kind_str, name, arch, branch = ref.split('/')
+            self._branches.setdefault((kind_str, name, arch), []).append(branch)
+        for branches in self._branches.values():
+            branches.sort()
+
+    def _get_full_ref(self, remote_ref):
+        """Fetch the details for a remote ref and create a FlatpakFullRef"""
+        # Get the full ostree ref
+        ref = remote_ref.format_ref()
+        logger.debug('Found %s ref %s', self.name, ref)
+
+        # Get the installed and download size
+        _, download_size, installed_size = eib.retry(
+            self.installation.fetch_remote_size_sync, self.name,
+            remote_ref)
+
+        metadata_bytes = eib.retry(
+            self.installation.fetch_remote_metadata_sync, self.name,
+            remote_ref)
+
+        # Parse the flatpak metadata to get the runtime and extra data
+        # settings. This uses GKeyFile like flatpak does, which also
+        # allows the duplicate sections or options that flatpak-builder
+        # apparently generates sometimes
+        # (https://phabricator.endlessm.com/T22435).
+        metadata = GLib.KeyFile()
+        try:
+            metadata.load_from_bytes(metadata_bytes, GLib.KeyFileFlags.NONE)
+        except:  # noqa: E722
+            print('Could not read {} {} metadata:\n{}'
+                  .format(self.name, ref,
+                          metadata_bytes.get_data().decode('utf-8')),
+                  file=sys.stderr)
+            raise
+
+        # Get all the related refs
+        logger.debug('Getting related refs for %s ref %s',
+                     self.name, ref)
+        related = eib.retry(
+            self.installation.list_remote_related_refs_sync,
+            self.name, ref)
+
+        # Create FlatpakFullRef
+        full_ref = FlatpakFullRef(remote=self,
+                                  remote_ref=remote_ref,
+                                  installed_size=installed_size,
+                                  download_size=download_size,
+                                  metadata=metadata,
+                                  related=related)
+        return full_ref
 
     def check_excluded(self, name):
         logger.debug(
@@ -437,43 +488,50 @@ class FlatpakRemote(object):
         """Find matches for a flatpak ref"""
         if not ref:
             raise FlatpakError('Cannot match empty ref')
-        if kind not in self.FLATPAK_KIND_MAP:
+        kind_str = self.FLATPAK_KIND_MAP.get(kind)
+        if kind_str is None:
             raise FlatpakError('Unrecognized refkind', kind, 'for ref',
                                ref)
 
-        kind_str = self.FLATPAK_KIND_MAP[kind]
         logger.info('Looking for %s ref "%s" match in %s', kind_str,
                     ref, self.name)
 
-        # Parse out a partial flatpak ref
-        parts = ref.split('/')
-        n_parts = len(parts)
-        name = parts[0]
-        arch = None
-        branch = None
-        if n_parts > 3:
-            raise FlatpakError('More than 2 /s in ref', ref)
-        elif n_parts == 3:
-            _, arch, branch = parts
-        elif n_parts == 2:
-            _, arch = parts
-
-        # Fallback to arch and branch defaults
-        if not arch:
+        if '/' not in ref:
+            # Most configured refs are a bare name, so use the arch and
+            # branch defaults directly
+            name = ref
             arch = self.arch
-        if not branch:
             branch = self.default_branch
+        else:
+            # Parse out a partial flatpak ref
+            parts = ref.split('/')
+            n_parts = len(parts)
+            name = parts[0]
+            arch = None
+            branch = None
+            if n_parts > 3:
+                raise FlatpakError('More than 2 /s in ref', ref)
+            elif n_parts == 3:
+                _, arch, branch = parts
+            elif n_parts == 2:
+                _, arch = parts
+
+            # Fallback to arch and branch defaults
+            if not arch:
+                arch = self.arch
+            if not branch:
+                branch = self.default_branch
 
         match = None
         if branch is None:
             # No specific branch and no default branch. Use the "latest"
             # branch by sort order.
-            match_ref = '/'.join((kind_str, name, arch, '*'))
-            logger.debug('Matching ref pattern "%s" in remote %s',
-                         match_ref, self.name)
-            matches = sorted(fnmatch.filter(self.refs.keys(), match_ref))
-            if len(matches) > 0:
-                match = self.refs[matches[-1]]
+            logger.debug('Matching latest %s/%s/%s branch in remote %s',
+                         kind_str, name, arch, self.name)
+            branches = self._branches.get((kind_str, name, arch))
+            if branches:
+                match_ref = '/'.join((kind_str, name, arch, branches[-1]))
+                match = self.refs[match_ref]
         else:
             match_ref = '/'.join((kind_str, name, arch, branch))
             logger.debug('Matching ref %s in remote %s', match_ref,
@@ -500,6 +558,9 @@ class FlatpakManager(object):
     """
     REMOTE_PREFIX = 'flatpak-remote-'
 
+    # Minimum number of seconds between free space log entries
+    FREE_SPACE_LOG_INTERVAL = 5
+
     def __init__(self, installation, config=None, is_cache_repo=False):
         self.installation = installation
         self.installation_path = self.installation.get_path().get_path()
@@ -511,6 +572,7 @@ class FlatpakManager(object):
         self.is_cache_repo = is_cache_repo
 
         self.install_refs = None
+        self._last_free_space_log = None
 
         # Get architecture from generic flatpak section, falling back to
         # default arch for host. The config default is an empty string,
@@ -531,6 +593,10 @@ class FlatpakManager(object):
         self.enable_p2p_updates = self.config.getboolean(
             'flatpak', 'enable_p2p_updates', fallback=False)
 
+        # Number of remotes enumerated concurrently
+        self.enumerate_remotes_concurrency = self.config.getint(
+            'flatpak', 'enumerate_remotes_concurrency', fallback=4)
+
         # See if extra-languages should be set
         self.set_extra_languages = self.config.getboolean(
             'flatpak', 'set_extra_languages', fallback=False)
@@ -591,44 +657,41 @@ class FlatpakManager(object):
         for remote in self.remotes.values():
             remote.deploy()
 
-    def _remove_languages(self):
+    @staticmethod
+    def _remove_repo_config_key(repo_config, group, key):
+        """Remove a repo config key, returning whether it was present"""
+        try:
+            repo_config.remove_key(group, key)
+        except GLib.Error as err:
+            # Ignore errors for missing group or key
+            if _keyfile_missing(err):
+                return False
+            raise
+        return True
+
+    def _remove_languages(self, repo_config):
         """Remove the core.xa.languages repo option"""
-        repo = self.get_repo()
-        repo_config = repo.copy_config()
+        changed = False
         for option in ["xa.languages", "xa.extra-languages"]:
             logger.info("Removing repo option core.%s", option)
-            try:
-                repo_config.remove_key('core', option)
-            except GLib.Error as err:
-                # Ignore errors for missing group or key
-                if err.matches(GLib.KeyFile.error_quark(),
-                               GLib.KeyFileError.GROUP_NOT_FOUND):
-                    pass
-                elif err.matches(GLib.KeyFile.error_quark(),
-                                 GLib.KeyFileError.KEY_NOT_FOUND):
-                    pass
-                else:
-                    raise
-        repo.write_config(repo_config)
-        self.installation.drop_caches()
+            if self._remove_repo_config_key(repo_config, 'core', option):
+                changed = True
+        return changed
 
-    def _set_extra_languages(self):
+    def _set_extra_languages(self, repo_config):
         """Set the core.xa.extra-languages repo option
 
         Define the flatpak languages to use for installs via the
         core.xa.extra-languages repo config option.
         """
         if len(self.locales) == 0:
-            return
-        repo = self.get_repo()
-        repo_config = repo.copy_config()
+            return False
         value = ';'.join(self.locales)
         logger.info('Setting repo option core.xa.extra-languages to %s', value)
         repo_config.set_value('core', 'xa.extra-languages', value)
-        repo.write_config(repo_config)
-        self.installation.drop_caches()
+        return True
 
-    def _set_masked(self):
+    def _set_masked(self, repo_config):
         """Set the core.xa.masked repo option from excluded flatpaks
 
         This is used to filter out excluded flatpaks that would
@@ -643,65 +706,87 @@ class FlatpakManager(object):
         for remote in self.remotes.values():
             excluded |= remote.exclude
         if len(excluded) == 0:
-            return
+            return False
 
-        repo = self.get_repo()
-        repo_config = repo.copy_config()
         value = ';'.join(excluded)
         logger.info('Setting repo option core.xa.masked to %s', value)
         repo_config.set_value('core', 'xa.masked', value)
-        repo.write_config(repo_config)
-        self.installation.drop_caches()
+        return True
 
-    def _remove_masked(self):
+    def _remove_masked(self, repo_config):
         """Remove the core.xa.masked repo option"""
+        logger.info('Removing repo option core.xa.masked')
+        return self._remove_repo_config_key(repo_config, 'core', 'xa.masked')
+
+    def _update_repo_config(self, *updates):
+        """Apply updates to the repo config with a single write
+
+        Each update is called with the repo config GKeyFile and returns
+        whether it changed anything. The config is only written and the
+        installation caches dropped when something changed.
+        """
         repo = self.get_repo()
         repo_config = repo.copy_config()
-        logger.info('Removing repo option core.xa.masked')
-        try:
-            repo_config.remove_key('core', 'xa.masked')
-        except GLib.Error as err:
-            # Ignore errors for missing group or key
-            if err.matches(GLib.KeyFile.error_quark(),
-                           GLib.KeyFileError.GROUP_NOT_FOUND):
-                pass
-            elif err.matches(GLib.KeyFile.error_quark(),
-                             GLib.KeyFileError.KEY_NOT_FOUND):
-                pass
-            else:
-                raise
-        repo.write_config(repo_config)
-        self.installation.drop_caches()
+        changed = False
+        for update in updates:
+            if update(repo_config):
+                changed = True
+        if changed:
+            repo.write_config(repo_config)
+            self.installation.drop_caches()
 
     @contextmanager
     def tmp_xa_config(self):
         """Temporary xa namespaced repo configuration"""
         try:
             # Configure the extra languages for pull or install.
-            self._set_extra_languages()
-            self._set_masked()
+            self._update_repo_config(self._set_extra_languages,
+                                     self._set_masked)
             yield
         finally:
+            updates = [self._remove_masked]
             if self.is_cache_repo or not self.set_extra_languages:
                 # Don't leave the languages hanging around for the next build
                 # or set in the image, respectively
-                self._remove_languages()
-            self._remove_masked()
+                updates.insert(0, self._remove_languages)
+            self._update_repo_config(*updates)
 
     def enumerate_remotes(self):
         """Enumerate all configured remotes"""
         # Set languages since subpaths get calculated when calling
         # installation.list_remote_related_refs_sync().
+        #
+        # Enumeration only reads from the remotes, so each one is
+        # handled concurrently. Adding and deploying remotes modify the
+        # shared repo config and need to stay serialized.
         with self.tmp_xa_config():
-            for remote in self.remotes.values():
-                remote.enumerate()
-
-    def _log_installation_free_space(self):
+            max_workers = max(
+                min(len(self.remotes), self.enumerate_remotes_concurrency), 1
+            )
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = [
+                    executor.submit(remote.enumerate)
+                    for remote in self.remotes.values()
+                ]
+                for future in futures:
+                    future.result()
+
+    def _log_installation_free_space(self, force=False):
         """Write a log entry with the available installation space
 
         Use os.statvfs to get the free and blocks at the installation's
-        path and then print a log message with the information.
+        path and then print a log message with the information. This is
+        called after every transaction operation, so it's skipped if the
+        last entry was written within FREE_SPACE_LOG_INTERVAL seconds
+        unless force is True.
         """
+        now = time.monotonic()
+        if (not force and self._last_free_space_log is not None and
+                now - self._last_free_space_log <
+                self.FREE_SPACE_LOG_INTERVAL):
+            return
+        self._last_free_space_log = now
+
         stats = os.statvfs(self.installation_path)
         free = stats.f_bsize * stats.f_bfree
         total = stats.f_bsize * stats.f_blocks
@@ -857,6 +942,10 @@ class FlatpakManager(object):
             txn.connect('operation-done', self._on_txn_op_done, 'pull')
             txn.run()
 
+        # Operations may have skipped the log, so always show the final
+        # free space.
+        self._log_installation_free_space(force=True)
+
     def _on_inst_txn_ready(self, transaction, cache_repo_path):
         operations = transaction.get_operations()
         self._log_operations(operations)
@@ -886,6 +975,10 @@ class FlatpakManager(object):
             txn.connect('operation-done', self._on_txn_op_done, 'install')
             txn.run()
 
+        # Operations may have skipped the log, so always show the final
+        # free space.
+        self._log_installation_free_space(force=True)
+
     def _on_resolve_txn_ready(self, transaction):
         # Return False to abort the transaction. Everything will be
         # handled after the transaction ends.
@@ -936,21 +1029,28 @@ class FlatpakManager(object):
         better if you could specify the OSTree pull localcache-repos
         option, but flatpak doesn't support that.
         """
+        repo = self.get_repo()
         cache_repo_file = Gio.File.new_for_path(cache_repo_path)
         cache_repo = OSTree.Repo.new(cache_repo_file)
         cache_repo.open()
-        revs_to_pull = []
+        revs_to_pull = set()
         for ref, rev in refs.items():
-            try:
-                _, _, state = cache_repo.load_commit(rev)
-            except GLib.GError as err:
-                if err.matches(Gio.io_error_quark(), Gio.IOErrorEnum.NOT_FOUND):
-                    logger.debug(
-                        'Skipping %s rev %s not in %s',
-                        ref, rev, cache_repo_path
-                    )
-                    continue
-                raise
+            # Skip the local object check and pull entirely if the
+            # installation repo already has the full commit, such as
+            # from a previous seed.
+            state = self._get_commit_state(repo, rev)
+            if state == OSTree.RepoCommitState.NORMAL:
+                logger.debug('Skipping %s rev %s already in installation',
+                             ref, rev)
+                continue
+
+            state = self._get_commit_state(cache_repo, rev)
+            if state is None:
+                logger.debug(
+                    'Skipping %s rev %s not in %s',
+                    ref, rev, cache_repo_path
+                )
+                continue
 
             # Pulling partial refs like locales would require working
             # out the subpaths. That doesn't seem worth the effort.
@@ -962,9 +1062,15 @@ class FlatpakManager(object):
                 continue
 
             logger.debug('Seeding %s rev %s from %s', ref, rev, cache_repo_path)
-            revs_to_pull.append(rev)
+            revs_to_pull.add(rev)
+
+        if not revs_to_pull:
+            logger.info('No commits to seed from %s', cache_repo_path)
+            return
 
-        # Figure out pull options
+        # Figure out pull options. Multiple refs can point to the same
+        # commit, so only pull each commit once.
+        revs_to_pull = sorted(revs_to_pull)
         logger.info('Seeding from %s: %s', cache_repo_path, revs_to_pull)
         remote = cache_repo_file.get_uri()
         options = GLib.Variant('a{sv}', {
@@ -974,7 +1080,6 @@ class FlatpakManager(object):
             'inherit-transaction': GLib.Variant('b', True),
         })
 
-        repo = self.get_repo()
         repo.prepare_transaction()
         try:
             self._log_installation_free_space()
@@ -986,3 +1091,17 @@ class FlatpakManager(object):
             raise
 
         self.installation.drop_caches()
+
+    @staticmethod
+    def _get_commit_state(repo, rev):
+        """Get the OSTree.RepoCommitState of rev in repo
+
+        Returns None if the commit isn't in the repo.
+        """
+        try:
+            _, _, state = repo.load_commit(rev)
+        except GLib.GError as err:
+            if err.matches(Gio.io_error_quark(), Gio.IOErrorEnum.NOT_FOUND):
+                return None
+            raise
+        return state
@@ -16,6 +16,7 @@
 # with this program; if not, write to the Free Software Foundation, Inc.,
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import eib
 import enum
 import logging
@@ -36,9 +37,18 @@ class RemoteKolibri:
         KOLIBRI_0_15 = enum.auto()
         KOLIBRI_0_16 = enum.auto()
 
-    def __init__(self, base_url, username, password):
+    # Delay in seconds between job status checks. The delay is increased
+    # while the job isn't making progress up to the maximum.
+    JOB_POLL_DELAY = 0.5
+    JOB_POLL_MAX_DELAY = 8.0
+
+    def __init__(self, base_url, username, password, series=None):
         self.base_url = base_url
 
+        # API endpoint URLs. Job and channel IDs are appended to these.
+        self._tasks_url = urljoin(self.base_url, 'api/tasks/tasks/')
+        self._channel_url = urljoin(self.base_url, 'api/content/channel/')
+
         # Start a requests session with the credentials.
         self.session = requests.Session()
         self.session.auth = (username, password)
@@ -46,7 +56,10 @@ class RemoteKolibri:
             'Content-Type': 'application/json',
         })
 
-        self.series = self._get_server_series()
+        # Probe the server series unless it's already known.
+        if series is None:
+            series = self._get_server_series()
+        self.series = series
 
     def import_channel(self, channel_id):
         """Import channel and content on remote Kolibri server"""
@@ -60,10 +73,7 @@ class RemoteKolibri:
     def _import_channel_0_15(self, channel_id):
         """Import channel and content on remote Kolibri 0.15 server"""
         # Import channel metadata.
-        url = urljoin(
-            self.base_url,
-            'api/tasks/tasks/startremotechannelimport/',
-        )
+        url = self._tasks_url + 'startremotechannelimport/'
         data = {'channel_id': channel_id}
         logger.info(f'Importing channel {channel_id} metadata')
         with self.session.post(url, json=data) as resp:
@@ -73,13 +83,10 @@ class RemoteKolibri:
                 logger.error('Failed to import channel: %s', resp.json())
                 raise
             job = resp.json()
-        self._wait_for_job(job['id'])
+        self._wait_for_job(job['id'], channel_id)
 
         # Import channel content.
-        url = urljoin(
-            self.base_url,
-            'api/tasks/tasks/startremotecontentimport/',
-        )
+        url = self._tasks_url + 'startremotecontentimport/'
         data = {
             'channel_id': channel_id,
             # Fetch all nodes so that the channel is fully mirrored.
@@ -94,11 +101,11 @@ class RemoteKolibri:
                 logger.error('Failed to import content: %s', resp.json())
                 raise
             job = resp.json()
-        self._wait_for_job(job['id'])
+        self._wait_for_job(job['id'], channel_id)
 
     def _import_channel_0_16(self, channel_id, update=False):
         """Import channel and content on remote Kolibri 0.16 server"""
-        url = urljoin(self.base_url, 'api/tasks/tasks/')
+        url = self._tasks_url
         data = {
             'type': 'kolibri.core.content.tasks.remoteimport',
             'channel_id': channel_id,
@@ -116,7 +123,7 @@ class RemoteKolibri:
                 logger.error('Failed to import channel: %s', resp.json())
                 raise
             job = resp.json()
-        self._wait_for_job(job['id'])
+        self._wait_for_job(job['id'], channel_id)
 
     def update_channel(self, channel_id):
         """Update channel and content on remote Kolibri server"""
@@ -130,7 +137,7 @@ class RemoteKolibri:
     def _update_channel_0_15(self, channel_id):
         """Update channel and content on remote Kolibri 0.15 server"""
         # Generate channel diff stats.
-        url = urljoin(self.base_url, 'api/tasks/tasks/channeldiffstats/')
+        url = self._tasks_url + 'channeldiffstats/'
         data = {'channel_id': channel_id, 'method': 'network'}
         logger.info(f'Generating channel {channel_id} diff')
         with self.session.post(url, json=data) as resp:
@@ -143,10 +150,10 @@ class RemoteKolibri:
                 )
                 raise
             job = resp.json()
-        self._wait_for_job(job['id'])
+        self._wait_for_job(job['id'], channel_id)
 
         # Update channel metadata and content.
-        url = urljoin(self.base_url, 'api/tasks/tasks/startchannelupdate/')
+        url = self._tasks_url + 'startchannelupdate/'
         data = {
             'channel_id': channel_id,
             'sourcetype': 'remote',
@@ -162,12 +169,12 @@ class RemoteKolibri:
                 logger.error('Failed to update channel: %s', resp.json())
                 raise
             job = resp.json()
-        self._wait_for_job(job['id'])
+        self._wait_for_job(job['id'], channel_id)
 
     def _update_channel_0_16(self, channel_id):
         """Update channel and content on remote Kolibri 0.15 server"""
         # Generate channel diff stats.
-        url = urljoin(self.base_url, 'api/tasks/tasks/')
+        url = self._tasks_url
         data = {
             'type': 'kolibri.core.content.tasks.remotechanneldiffstats',
             'channel_id': channel_id,
@@ -181,7 +188,7 @@ class RemoteKolibri:
                 logger.error('Failed to generate channel diff: %s', resp.json())
                 raise
             job = resp.json()
-        self._wait_for_job(job['id'])
+        self._wait_for_job(job['id'], channel_id)
 
         # Update channel metadata and content.
         self._import_channel_0_16(channel_id, update=True)
@@ -214,19 +221,21 @@ class RemoteKolibri:
 
         raise Exception(f'Unsupported remote Kolibri version "{kolibri_version}"')
 
-    def _get_job_status(self, job_id):
-        """Get remote Kolibri job status"""
-        url = urljoin(self.base_url, f'api/tasks/tasks/{job_id}/')
+    def _get_job_status(self, url):
+        """Get remote Kolibri job status from the job's URL"""
         with self.session.get(url) as resp:
             resp.raise_for_status()
             return resp.json()
 
-    def _wait_for_job(self, job_id):
-        """Wait for remote Kolibri job to complete"""
-        logger.debug(f'Waiting for job {job_id} to complete')
+    def _wait_for_job(self, job_id, channel_id):
+        """Wait for remote Kolibri job for a channel to complete"""
+        logger.debug(f'Waiting for channel {channel_id} job {job_id} to complete')
+        url = f'{self._tasks_url}{job_id}/'
         last_marker = None
+        last_percentage = None
+        delay = self.JOB_POLL_DELAY
         while True:
-            data = self._get_job_status(job_id)
+            data = self._get_job_status(url)
 
             # See the kolibri.core.tasks.job.State class for potential states
             # https://github.com/learningequality/kolibri/blob/develop/kolibri/core/tasks/job.py#L17
@@ -241,22 +250,51 @@ class RemoteKolibri:
                 raise Exception(f'Job {job_id} cancelled')
             elif status == 'COMPLETED':
                 if last_marker is None or last_marker < 100:
-                    logger.info('Progress: 100%')
+                    logger.info(f'Channel {channel_id} progress: 100%')
                 break
 
-            pct = int(data['percentage'] * 100)
+            percentage = data['percentage']
+            pct = int(percentage * 100)
             marker = pct - pct % 5
             if last_marker is None or marker > last_marker:
-                logger.info(f'Progress: {pct}%')
+                logger.info(f'Channel {channel_id} progress: {pct}%')
                 last_marker = marker
 
-            # Wait a bit before checking the status again.
-            sleep(0.5)
+            # Wait a bit before checking the status again. Back off while
+            # the job isn't progressing and check quickly again when it
+            # is.
+            if last_percentage is not None and percentage == last_percentage:
+                delay = min(delay * 1.5, self.JOB_POLL_MAX_DELAY)
+            else:
+                delay = self.JOB_POLL_DELAY
+            last_percentage = percentage
+            sleep(delay)
 
     def _channel_exists(self, channel_id):
         """Check if channel exists on remote Kolibri server"""
-        url = urljoin(self.base_url, f'api/content/channel/{channel_id}/')
+        url = f'{self._channel_url}{channel_id}/'
         logger.debug(f'Checking if channel {channel_id} exists')
+
+        # Only the status is needed, so try a HEAD request to skip the
+        # channel metadata. Fall back to GET if the server doesn't allow
+        # HEAD.
+        with self.session.head(url, allow_redirects=True) as resp:
+            if resp.status_code != 405:
+                try:
+                    resp.raise_for_status()
+                except requests.exceptions.HTTPError:
+                    if resp.status_code == 404:
+                        return False
+                    # HEAD responses have no body, so log the status.
+                    logger.error(
+                        'Failed to check channel existence: %s %s',
+                        resp.status_code,
+                        resp.reason,
+                    )
+                    raise
+                else:
+                    return True
+
         with self.session.get(url) as resp:
             try:
                 resp.raise_for_status()
@@ -299,9 +337,31 @@ def seed_remote_channels(channel_ids):
         return False
     username, _, password = creds
 
-    remote = RemoteKolibri(base_url, username, password)
-    for channel in channel_ids:
+    # Probe the server version once for all the channels.
+    series = RemoteKolibri(base_url, username, password).series
+
+    # Channel imports are independent jobs on the server, so seed them
+    # concurrently. Each channel gets its own RemoteKolibri since a
+    # requests session shouldn't be shared between threads.
+    def seed_channel(channel):
         logger.info(f'Seeding channel {channel} on {host}')
+        remote = RemoteKolibri(base_url, username, password, series)
         remote.seed_channel(channel)
 
+    parallelism = config.getint('kolibri', 'seed_parallelism', fallback=4)
+    with ThreadPoolExecutor(max_workers=max(parallelism, 1)) as executor:
+        futures = [
+            executor.submit(seed_channel, channel) for channel in channel_ids
+        ]
+        try:
+            for future in as_completed(futures):
+                future.result()
+        except BaseException:
+            # Don't start any queued channels after a failure. This is
+            # shutdown(cancel_futures=True) for python < 3.9. Channels
+            # already being seeded are waited on when the executor exits.
+            for future in futures:
+                future.cancel()
+            raise
+
     return True
@@ -17,6 +17,29 @@ run_build = import_script('run_build', os.path.join(SRCDIR, 'run-build'))
 sys.path.insert(1, LIBDIR)
 import eib  # noqa: E402
 
+# Fixed build section settings for builder_config
+BUILDER_CONFIG_DEFAULTS = {
+    'product': 'eoscustom',
+    'branch': 'master',
+    'arch': 'amd64',
+    'platform': 'amd64',
+    'personality': 'base',
+    'dry_run': 'false',
+    'series': 'master',
+    'srcdir': SRCDIR,
+    'build_version': '200101-000000',
+    'use_production_ostree': 'false'
+}
+BUILDER_CONFIG_ATTRS = frozenset(run_build.ImageBuilder.CONFIG_ATTRS)
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        '--cached-flatpak',
+        action='store_true',
+        help='reuse test flatpak builds from the pytest cache',
+    )
+
 
 @pytest.fixture
 def config():
@@ -31,25 +54,16 @@ def builder_config(config):
     This fills in the build section like ImageBuilder so that
     interpolation of full sections should succeed.
     """
+    config[config.BUILD_SECTION].update(BUILDER_CONFIG_DEFAULTS)
+    # The system paths may have been overridden by tmp_builder_paths.
     config[config.BUILD_SECTION].update({
-        'product': 'eoscustom',
-        'branch': 'master',
-        'arch': 'amd64',
-        'platform': 'amd64',
-        'personality': 'base',
-        'dry_run': 'false',
-        'series': 'master',
-        'srcdir': SRCDIR,
         'cachedir': eib.CACHEDIR,
         'sysconfdir': eib.SYSCONFDIR,
-        'build_version': '200101-000000',
-        'use_production_ostree': 'false'
     })
 
     # Make sure only the intended settings from ImageBuilder are set
     test_attrs = set(config[config.BUILD_SECTION])
-    expected_attrs = set(run_build.ImageBuilder.CONFIG_ATTRS)
-    assert test_attrs == expected_attrs
+    assert test_attrs == BUILDER_CONFIG_ATTRS
 
     return config
 
@@ -89,14 +103,16 @@ def tmp_bindir(tmp_path, monkeypatch):
     return bindir
 
 
+class MockDatetime(datetime.datetime):
+    """datetime class with fixed utcnow"""
+    @classmethod
+    def utcnow(cls):
+        return cls(2000, 1, 1)
+
+
 @pytest.fixture
 def mock_datetime(monkeypatch):
     """Mock datetime class with fixed utcnow"""
-    class MockDatetime(datetime.datetime):
-        @classmethod
-        def utcnow(cls):
-            return cls(2000, 1, 1)
-
     monkeypatch.setattr(datetime, 'datetime', MockDatetime)
 
 
@@ -115,14 +131,35 @@ def make_builder(tmp_builder_config, tmp_builder_paths, mock_datetime):
     return _make_builder
 
 
+@pytest.fixture(scope='session')
+def gpgdir_template(tmp_path_factory):
+    """GPG homedir with keys imported to copy for each test
+
+    Importing the keys is slow, so it's done once per session.
+    """
+    homedir = tmp_path_factory.mktemp('gnupg')
+    homedir.chmod(0o700)
+    key_paths = [
+        os.path.join(TESTSDIR, 'data', key)
+        for key in ('test1.key', 'test2.key', 'test3.key')
+    ]
+    subprocess.check_call(
+        ['gpg', '--homedir', str(homedir), '--batch', '--import'] + key_paths
+    )
+    return homedir
+
+
 @pytest.fixture
-def builder_gpgdir(tmp_builder_paths):
+def builder_gpgdir(tmp_builder_paths, gpgdir_template):
     """Image builder GPG homedir with keys imported"""
     homedir = tmp_builder_paths['SYSCONFDIR'] / 'gnupg'
-    homedir.mkdir(mode=0o700, parents=True)
-    for key in ('test1.key', 'test2.key', 'test3.key'):
-        key_path = os.path.join(TESTSDIR, 'data', key)
-        subprocess.check_call((
-            'gpg', '--homedir', str(homedir), '--batch', '--import', key_path
-        ))
+    homedir.parent.mkdir(parents=True, exist_ok=True)
+
+    # Skip any agent sockets and lock files from the template.
+    shutil.copytree(
+        gpgdir_template,
+        homedir,
+        ignore=shutil.ignore_patterns('S.*', '*.lock', '.#lk*'),
+    )
+    homedir.chmod(0o700)
     return homedir
@@ -1,13 +1,18 @@
 # Tests for eibflatpak module
 
 from base64 import b64encode
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+import hashlib
 import logging
 import os
+from pathlib import Path
 import pytest
 import shutil
 import subprocess
 from textwrap import dedent
-from urllib.parse import urljoin
+import threading
 
 from ..util import (
     TESTSDIR,
@@ -31,6 +36,21 @@ FLATPAKS = [
     ('app-extra-data', 'master'),
 ]
 
+# Refs resolved and installed from the test remote with the default
+# flatpak_config.
+EXPECTED_REFS = frozenset({
+    'app/com.example.App1/x86_64/master',
+    'runtime/com.example.App1.Locale/x86_64/master',
+    'app/com.example.App2/x86_64/master',
+    'runtime/com.example.App2.Locale/x86_64/master',
+    'runtime/com.example.Platform/x86_64/1',
+    'runtime/com.example.Platform.Locale/x86_64/1',
+    'runtime/com.example.Platform/x86_64/2',
+    'runtime/com.example.Platform.Locale/x86_64/2',
+})
+EXPECTED_REMOTE_REFS = frozenset(f'example:{ref}' for ref in EXPECTED_REFS)
+EXPECTED_DEPLOY_REFS = frozenset(f'deploy/{ref}' for ref in EXPECTED_REFS)
+
 
 HAVE_PREREQS = True
 try:
@@ -82,60 +102,104 @@ def remote_flatpak_repo_path(tmp_path):
     return path
 
 
-@pytest.fixture
-def remote_flatpak_repo(remote_flatpak_repo_path):
-    repo_file = Gio.File.new_for_path(str(remote_flatpak_repo_path))
-    repo = OSTree.Repo.new(repo_file)
-    repo.set_collection_id('com.example.FlatpakRepo')
+def create_archive_repo(path, collection_id=None):
+    """Create an archive mode OSTree repo for testing
+
+    fsync is disabled since the test repos are disposable and writing
+    many small objects is otherwise dominated by syncing.
+    """
+    repo = OSTree.Repo.new(Gio.File.new_for_path(str(path)))
+    if collection_id:
+        repo.set_collection_id(collection_id)
     repo.create(OSTree.RepoMode.ARCHIVE)
+    config = repo.copy_config()
+    config.set_boolean('core', 'fsync', False)
+    repo.write_config(config)
     return repo
 
 
 @pytest.fixture
-def remote_flatpak_server(remote_flatpak_repo_path, remote_flatpak_repo,
-                          builder_gpgdir):
+def remote_flatpak_repo(remote_flatpak_repo_path):
+    return create_archive_repo(remote_flatpak_repo_path,
+                               'com.example.FlatpakRepo')
+
+
+@pytest.fixture(scope='session')
+def flatpak_http_server(tmp_path_factory):
+    """HTTP server shared by the remote flatpak repos
+
+    Each remote repo is linked into the server's root directory.
+    """
+    root = tmp_path_factory.mktemp('flatpak-http')
+    with http_server_thread(root) as url:
+        yield {
+            'path': root,
+            'url': url,
+        }
+
+
+@pytest.fixture(scope='session')
+def remote_gpg_key_b64(gpgdir_template):
+    """Base64 encoded test1 public key for flatpakrepo files"""
     export_cmd = (
-        'gpg', '--homedir', str(builder_gpgdir),
+        'gpg', '--homedir', str(gpgdir_template),
         '--export', TEST_KEY_IDS['test1']
     )
     proc = run_command(export_cmd, check=True, stdout=subprocess.PIPE)
-    gpg_key_b64 = b64encode(proc.stdout).decode('ascii')
-
-    with http_server_thread(remote_flatpak_repo_path) as url:
-        flatpakrepo_path = remote_flatpak_repo_path / 'example.flatpakrepo'
-        flatpakrepo_url = urljoin(url, flatpakrepo_path.name)
-        flatpakrepo_content = dedent(
-            f"""\
-            [Flatpak Repo]
-            Version=1
-            Url={url}
-            Title=Example Repo
-            DefaultBranch=master
-            GPGKey={gpg_key_b64}
-            """
-        )
-        with open(flatpakrepo_path, 'w') as f:
-            f.write(flatpakrepo_content)
+    return b64encode(proc.stdout).decode('ascii')
 
+
+@pytest.fixture
+def remote_flatpak_server(remote_flatpak_repo_path, remote_flatpak_repo,
+                          remote_gpg_key_b64, flatpak_http_server, tmp_path):
+    # Serve the repo from a unique path on the shared server. The
+    # test's tmp_path name is unique within the session.
+    server_path = flatpak_http_server['path'] / tmp_path.name
+    server_path.symlink_to(remote_flatpak_repo_path, target_is_directory=True)
+    url = f'{flatpak_http_server["url"]}/{tmp_path.name}'
+
+    flatpakrepo_path = remote_flatpak_repo_path / 'example.flatpakrepo'
+    flatpakrepo_url = f'{url}/{flatpakrepo_path.name}'
+    flatpakrepo_content = dedent(
+        f"""\
+        [Flatpak Repo]
+        Version=1
+        Url={url}
+        Title=Example Repo
+        DefaultBranch=master
+        GPGKey={remote_gpg_key_b64}
+        """
+    )
+    with open(flatpakrepo_path, 'w') as f:
+        f.write(flatpakrepo_content)
+
+    try:
         yield {
             'path': remote_flatpak_repo_path,
             'repo': remote_flatpak_repo,
             'url': url,
             'flatpakrepo_url': flatpakrepo_url,
         }
+    finally:
+        server_path.unlink()
+
 
+def build_flatpak(srcdir, builddir, repodir, branch, export_lock=None):
+    """Build a flatpak from static data
 
-def build_flatpak(srcdir, builddir, repodir, branch):
-    """Build a flatpak from static data"""
+    If export_lock is provided, it's held while exporting to repodir so
+    that multiple builds can run concurrently.
+    """
     logger.info(f'Building {srcdir} branch {branch}')
     shutil.rmtree(builddir, ignore_errors=True)
     shutil.copytree(srcdir, builddir)
     builddir.joinpath('files').mkdir(exist_ok=True)
     builddir.joinpath('usr').mkdir(exist_ok=True)
     run_command(('flatpak', 'build-finish', str(builddir)))
-    run_command(
-        ('flatpak', 'build-export', str(repodir), str(builddir), branch),
-    )
+    with export_lock or nullcontext():
+        run_command(
+            ('flatpak', 'build-export', str(repodir), str(builddir), branch),
+        )
 
 
 def get_installation_repo(installation):
@@ -146,35 +210,44 @@ def get_installation_repo(installation):
     return repo
 
 
-def _get_commit_dir_files(directory):
-    enumerator = directory.enumerate_children(
-        'standard::name,standard::type,standard::size,standard::is-symlink,'
-        'standard::symlink-target',
-        Gio.FileQueryInfoFlags.NOFOLLOW_SYMLINKS,
-    )
-    while True:
-        child_info = enumerator.next_file()
-        if child_info is None:
-            break
-
-        child = enumerator.get_child(child_info)
-        child_path = child.get_path()
-        try:
-            child.ensure_resolved()
-        except GLib.GError as err:
-            logger.debug(
-                '%s commit %s missing: %s',
-                child.get_checksum(),
-                child_path,
-                err
-            )
-            continue
-
-        child_type = child_info.get_file_type()
-        child_target = child_info.get_symlink_target()
-        yield (child_path, child_type, child_target)
-        if child_type == Gio.FileType.DIRECTORY:
-            yield from _get_commit_dir_files(child)
+# Only the attributes used by _get_commit_dir_files
+COMMIT_FILE_ATTRIBUTES = 'standard::name,standard::type,standard::symlink-target'
+
+
+def _get_commit_dir_files(root):
+    # Walk the tree with an explicit queue rather than recursing for
+    # each subdirectory. Gio only provides a synchronous enumerator for
+    # one file at a time.
+    directories = deque([root])
+    while directories:
+        directory = directories.popleft()
+        enumerator = directory.enumerate_children(
+            COMMIT_FILE_ATTRIBUTES,
+            Gio.FileQueryInfoFlags.NOFOLLOW_SYMLINKS,
+        )
+        while True:
+            child_info = enumerator.next_file()
+            if child_info is None:
+                break
+
+            child = enumerator.get_child(child_info)
+            child_path = child.get_path()
+            try:
+                child.ensure_resolved()
+            except GLib.GError as err:
+                logger.debug(
+                    '%s commit %s missing: %s',
+                    child.get_checksum(),
+                    child_path,
+                    err
+                )
+                continue
+
+            child_type = child_info.get_file_type()
+            child_target = child_info.get_symlink_target()
+            yield (child_path, child_type, child_target)
+            if child_type == Gio.FileType.DIRECTORY:
+                directories.append(child)
 
 
 def get_commit_files(repo, ref):
@@ -183,61 +256,151 @@ def get_commit_files(repo, ref):
     return _get_commit_dir_files(root)
 
 
+def get_flatpak_data_digest():
+    """Get a digest of the test flatpak sources and branches
+
+    The flatpak version is included since it determines how the
+    flatpaks are built.
+    """
+    digest = hashlib.sha256()
+    proc = run_command(('flatpak', '--version'), stdout=subprocess.PIPE)
+    digest.update(proc.stdout)
+    digest.update(repr(FLATPAKS).encode('utf-8'))
+    datadir = os.path.join(TESTSDIR, 'data/flatpak')
+    for root, dirs, files in os.walk(datadir):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            digest.update(os.path.relpath(path, datadir).encode('utf-8'))
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
 @pytest.fixture(scope='session')
-def flatpak_build_repo(tmp_path_factory):
-    """OSTree repo populated with built flatpaks"""
+def flatpak_build_repo(tmp_path_factory, pytestconfig):
+    """OSTree repo populated with built flatpaks
+
+    With --cached-flatpak, the repo is stored in the pytest cache keyed
+    by the test flatpak data so the builds can be skipped on later runs.
+    """
     repo_path = tmp_path_factory.getbasetemp() / 'flatpak-build-repo'
+
+    cache_path = None
+    use_cache = pytestconfig.getoption('cached_flatpak')
+    if use_cache and pytestconfig.cache is None:
+        # The cache is provided by the cacheprovider plugin, which may
+        # have been disabled with -p no:cacheprovider.
+        logger.warning('Pytest cache unavailable, not using cached '
+                       'flatpak build repo')
+        use_cache = False
+    if use_cache:
+        cache_dir = Path(str(pytestconfig.cache.makedir('flatpak-build-repo')))
+        cache_path = cache_dir / get_flatpak_data_digest()
+        if cache_path.exists():
+            logger.info(f'Using cached flatpak build repo {cache_path}')
+            shutil.copytree(cache_path, repo_path, symlinks=True)
+            repo = OSTree.Repo.new(Gio.File.new_for_path(str(repo_path)))
+            repo.open()
+            return repo
+
     repo_path.mkdir()
-    repo = OSTree.Repo.new(Gio.File.new_for_path(str(repo_path)))
-    repo.create(OSTree.RepoMode.ARCHIVE)
+    repo = create_archive_repo(repo_path)
 
+    # The builds are independent, so run them concurrently in separate
+    # build directories. Exporting to the shared repo is serialized.
     build_path = tmp_path_factory.getbasetemp() / 'flatpak-build'
-    for src, branch in FLATPAKS:
+    export_lock = threading.Lock()
+
+    def build(src, branch):
         srcdir = os.path.join(TESTSDIR, 'data/flatpak', src)
-        build_flatpak(srcdir, build_path, repo_path, branch)
+        build_flatpak(srcdir, build_path / src, repo_path, branch,
+                      export_lock)
+
+    max_workers = min(len(FLATPAKS), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(build, src, branch) for src, branch in FLATPAKS
+        ]
+        for future in futures:
+            future.result()
+
+    if cache_path is not None:
+        # Copy to a temporary path first so an interrupted copy isn't
+        # used later.
+        logger.info(f'Caching flatpak build repo in {cache_path}')
+        tmp_cache_path = cache_path.with_name(cache_path.name + '.tmp')
+        shutil.rmtree(tmp_cache_path, ignore_errors=True)
+        shutil.copytree(repo_path, tmp_cache_path, symlinks=True)
+        tmp_cache_path.rename(cache_path)
 
     return repo
 
 
-@pytest.fixture
-def full_remote_flatpak_server(flatpak_build_repo, remote_flatpak_server,
-                               builder_gpgdir):
-    """Flatpak remote server populated with built flatpaks"""
-    _, all_refs = flatpak_build_repo.list_refs(None)
-    logger.info(f'All build refs: {all_refs}')
+@pytest.fixture(scope='session')
+def remote_flatpak_repo_template(flatpak_build_repo, gpgdir_template,
+                                 tmp_path_factory):
+    """Signed remote repo populated with built flatpaks
 
-    _, app_refs = flatpak_build_repo.list_refs_ext(
-        'app',
-        OSTree.RepoListRefsExtFlags.NONE,
-    )
-    _, runtime_refs = flatpak_build_repo.list_refs_ext(
-        'runtime',
-        OSTree.RepoListRefsExtFlags.NONE,
+    Committing and signing all the refs is slow, so it's done once per
+    session and full_remote_flatpak_server copies the result.
+    """
+    path = tmp_path_factory.mktemp('remote-flatpak-repo-template')
+    create_archive_repo(path, 'com.example.FlatpakRepo')
+
+    # List the refs once and filter out the appstream refs.
+    _, all_refs = flatpak_build_repo.list_refs(None)
+    logger.debug(f'All build refs: {all_refs}')
+    build_refs = sorted(
+        ref for ref in all_refs if ref.startswith(('app/', 'runtime/'))
     )
-    build_refs = sorted(app_refs.keys() | runtime_refs.keys())
     logger.info(f'Build refs: {build_refs}')
 
+    # Commit all the refs in a single build-commit-from run.
     src_repo = flatpak_build_repo.get_path().get_path()
-    for ref in build_refs:
-        run_command((
-            'flatpak',
-            'build-commit-from',
-            f'--src-repo={src_repo}',
-            f'--gpg-sign={TEST_KEY_IDS["test1"]}',
-            f'--gpg-homedir={builder_gpgdir}',
-            '--no-update-summary',
-            f'{remote_flatpak_server["path"]}',
-            ref,
-        ))
+    run_command((
+        'flatpak',
+        'build-commit-from',
+        f'--src-repo={src_repo}',
+        f'--gpg-sign={TEST_KEY_IDS["test1"]}',
+        f'--gpg-homedir={gpgdir_template}',
+        '--no-update-summary',
+        str(path),
+        *build_refs,
+    ))
 
     run_command((
         'flatpak',
         'build-update-repo',
         f'--gpg-sign={TEST_KEY_IDS["test1"]}',
-        f'--gpg-homedir={builder_gpgdir}',
-        str(remote_flatpak_server['path']),
+        f'--gpg-homedir={gpgdir_template}',
+        str(path),
     ))
 
+    return path
+
+
+@pytest.fixture
+def full_remote_flatpak_server(remote_flatpak_repo_template,
+                               remote_flatpak_server):
+    """Flatpak remote server populated with built flatpaks"""
+    # Hardlink the template repo files into the test's remote repo. OSTree
+    # objects are immutable and refs and summaries are replaced rather
+    # than rewritten, so tests can add commits without affecting the
+    # template. The repo config is the same, so it's kept.
+    def ignore_toplevel(directory, names):
+        if directory == str(remote_flatpak_repo_template):
+            return {'config', 'tmp', '.lock'}.intersection(names)
+        return set()
+
+    shutil.copytree(
+        remote_flatpak_repo_template,
+        remote_flatpak_server['path'],
+        copy_function=os.link,
+        ignore=ignore_toplevel,
+        dirs_exist_ok=True,
+    )
+
     _, all_remote_refs = remote_flatpak_server['repo'].list_refs(None)
     logger.debug(f'All remote refs: {all_remote_refs}')
 
@@ -264,6 +427,23 @@ def flatpak_config(builder_config, remote_flatpak_server):
     return builder_config
 
 
+@pytest.fixture
+def flatpak_manager(local_flatpak_installation, flatpak_config,
+                    full_remote_flatpak_server):
+    """FlatpakManager with the default test config and enumerated remotes
+
+    Tests that change the flatpak configuration need to create their own
+    manager since the remote options are read when it's constructed.
+    """
+    manager = eibflatpak.FlatpakManager(
+        local_flatpak_installation,
+        config=flatpak_config,
+    )
+    manager.add_remotes()
+    manager.enumerate_remotes()
+    return manager
+
+
 def test_pull(local_flatpak_installation, flatpak_config,
               full_remote_flatpak_server):
     """Pull to cache repo
@@ -287,21 +467,11 @@ def test_pull(local_flatpak_installation, flatpak_config,
 
     inst_repo = get_installation_repo(local_flatpak_installation)
     _, inst_repo_refs = inst_repo.list_refs(None)
-    expected_repo_refs = {
-        'example:app/com.example.App1/x86_64/master',
-        'example:runtime/com.example.App1.Locale/x86_64/master',
-        'example:app/com.example.App2/x86_64/master',
-        'example:runtime/com.example.App2.Locale/x86_64/master',
-        'example:runtime/com.example.Platform/x86_64/1',
-        'example:runtime/com.example.Platform.Locale/x86_64/1',
-        'example:runtime/com.example.Platform/x86_64/2',
-        'example:runtime/com.example.Platform.Locale/x86_64/2',
-    }
-    assert inst_repo_refs.keys() == expected_repo_refs
+    assert inst_repo_refs.keys() == EXPECTED_REMOTE_REFS
 
     # Ensure the expected locale files have been pulled.
     locale_refs = [
-        ref for ref in expected_repo_refs if '.Locale' in ref
+        ref for ref in EXPECTED_REMOTE_REFS if '.Locale' in ref
     ]
     for ref in locale_refs:
         files = set(get_commit_files(inst_repo, ref))
@@ -311,55 +481,22 @@ def test_pull(local_flatpak_installation, flatpak_config,
         assert ('/files/fr', Gio.FileType.DIRECTORY, None) not in files
 
 
-def test_install(local_flatpak_installation, flatpak_config,
-                 full_remote_flatpak_server):
+def test_install(local_flatpak_installation, flatpak_manager):
     """Install flatpaks
 
     This is approximately what hooks/image/50-flatpak.chroot does.
     """
-    manager = eibflatpak.FlatpakManager(
-        local_flatpak_installation,
-        config=flatpak_config,
-    )
-    manager.add_remotes()
-    manager.enumerate_remotes()
-    manager.install()
+    flatpak_manager.install()
 
     installed_refs = {
         ref.format_ref() for ref in
         local_flatpak_installation.list_installed_refs()
     }
-    assert installed_refs == {
-        'app/com.example.App1/x86_64/master',
-        'runtime/com.example.App1.Locale/x86_64/master',
-        'app/com.example.App2/x86_64/master',
-        'runtime/com.example.App2.Locale/x86_64/master',
-        'runtime/com.example.Platform/x86_64/1',
-        'runtime/com.example.Platform.Locale/x86_64/1',
-        'runtime/com.example.Platform/x86_64/2',
-        'runtime/com.example.Platform.Locale/x86_64/2',
-    }
+    assert installed_refs == EXPECTED_REFS
 
     inst_repo = get_installation_repo(local_flatpak_installation)
     _, inst_repo_refs = inst_repo.list_refs(None)
-    assert inst_repo_refs.keys() == {
-        'deploy/app/com.example.App1/x86_64/master',
-        'deploy/runtime/com.example.App1.Locale/x86_64/master',
-        'deploy/app/com.example.App2/x86_64/master',
-        'deploy/runtime/com.example.App2.Locale/x86_64/master',
-        'deploy/runtime/com.example.Platform/x86_64/1',
-        'deploy/runtime/com.example.Platform.Locale/x86_64/1',
-        'deploy/runtime/com.example.Platform/x86_64/2',
-        'deploy/runtime/com.example.Platform.Locale/x86_64/2',
-        'example:app/com.example.App1/x86_64/master',
-        'example:runtime/com.example.App1.Locale/x86_64/master',
-        'example:app/com.example.App2/x86_64/master',
-        'example:runtime/com.example.App2.Locale/x86_64/master',
-        'example:runtime/com.example.Platform/x86_64/1',
-        'example:runtime/com.example.Platform.Locale/x86_64/1',
-        'example:runtime/com.example.Platform/x86_64/2',
-        'example:runtime/com.example.Platform.Locale/x86_64/2',
-    }
+    assert inst_repo_refs.keys() == EXPECTED_DEPLOY_REFS | EXPECTED_REMOTE_REFS
 
     # Ensure the expected locale subpaths have been installed.
     locale_refs = [
@@ -372,75 +509,100 @@ def test_install(local_flatpak_installation, flatpak_config,
         assert subpaths == ['/en', '/es']
 
 
-def test_resolve(local_flatpak_installation, flatpak_config,
-                 full_remote_flatpak_server):
-    manager = eibflatpak.FlatpakManager(
-        local_flatpak_installation,
-        config=flatpak_config,
-    )
-    manager.add_remotes()
-    manager.enumerate_remotes()
-    resolved_full_refs = manager.resolve()
+def test_resolve(flatpak_manager):
+    resolved_full_refs = flatpak_manager.resolve()
 
     resolved_refs = {fr.ref for fr in resolved_full_refs}
-    assert resolved_refs == {
-        'app/com.example.App1/x86_64/master',
-        'runtime/com.example.App1.Locale/x86_64/master',
-        'app/com.example.App2/x86_64/master',
-        'runtime/com.example.App2.Locale/x86_64/master',
-        'runtime/com.example.Platform/x86_64/1',
-        'runtime/com.example.Platform.Locale/x86_64/1',
-        'runtime/com.example.Platform/x86_64/2',
-        'runtime/com.example.Platform.Locale/x86_64/2',
-    }
+    assert resolved_refs == EXPECTED_REFS
+
+
+@pytest.mark.parametrize(['ref', 'runtime'], [
+    ('app/com.example.App1/x86_64/master',
+     'runtime/com.example.Platform/x86_64/1'),
+    ('app/com.example.App2/x86_64/master',
+     'runtime/com.example.Platform/x86_64/2'),
+    ('app/com.example.AppExtraData/x86_64/master',
+     'runtime/com.example.Platform/x86_64/1'),
+    ('runtime/com.example.Platform/x86_64/1', None),
+    ('runtime/com.example.App1.Locale/x86_64/master', None),
+])
+def test_runtime(flatpak_manager, ref, runtime):
+    """Runtime dependency from ref metadata"""
+    full_ref = flatpak_manager.remotes['example'].refs[ref]
+    assert full_ref.runtime == runtime
+
+
+SEED_APP_REF = 'app/com.example.App1/x86_64/master'
+SEED_LOCALE_REFS = (
+    'runtime/com.example.App1.Locale/x86_64/master',
+    'runtime/com.example.App2.Locale/x86_64/master',
+)
 
 
-def test_seed(local_flatpak_installation, flatpak_config, full_remote_flatpak_server,
-              tmp_path):
-    """Seed from cache repo"""
-    cache_repo_path = tmp_path / 'cache-repo'
-    cache_repo = OSTree.Repo.new(Gio.File.new_for_path(str(cache_repo_path)))
-    cache_repo.create(OSTree.RepoMode.ARCHIVE)
+@pytest.fixture(scope='session')
+def seed_cache_repo_template(tmp_path_factory, remote_flatpak_repo_template):
+    """Cache repo template for seeding tests
 
-    remote_repo_uri = full_remote_flatpak_server['path'].as_uri()
-    app_ref = 'app/com.example.App1/x86_64/master'
-    locale_ref = 'runtime/com.example.App1.Locale/x86_64/master'
+    The App1 commit is pulled in full while only the English subpaths of
+    the App1 and App2 locale commits are pulled, leaving them partial.
+    """
+    path = tmp_path_factory.mktemp('seed-cache-repo-template')
+    create_archive_repo(path)
     run_command((
         'ostree',
-        f'--repo={cache_repo_path}',
+        f'--repo={path}',
         'remote',
         'add',
         '--no-gpg-verify',
         'origin',
-        remote_repo_uri,
+        remote_flatpak_repo_template.as_uri(),
     ))
     run_command((
         'ostree',
-        f'--repo={cache_repo_path}',
+        f'--repo={path}',
         'pull',
         'origin',
-        app_ref,
+        SEED_APP_REF,
     ))
     run_command((
         'ostree',
-        f'--repo={cache_repo_path}',
+        f'--repo={path}',
         'pull',
         '--subpath=/metadata',
         '--subpath=/files/en',
         'origin',
-        locale_ref,
+        *SEED_LOCALE_REFS,
     ))
+    return path
+
 
+@pytest.fixture
+def seed_cache_repo_path(seed_cache_repo_template, tmp_path):
+    """Per test copy of the seed cache repo template"""
+    # Like full_remote_flatpak_server, hardlink the immutable objects
+    # rather than copying them.
+    path = tmp_path / 'cache-repo'
+    shutil.copytree(
+        seed_cache_repo_template,
+        path,
+        copy_function=os.link,
+        ignore=shutil.ignore_patterns('.lock'),
+    )
+    return path
+
+
+def test_seed(local_flatpak_installation, flatpak_manager,
+              seed_cache_repo_path, caplog):
+    """Seed from cache repo"""
+    cache_repo_path = seed_cache_repo_path
+    cache_repo = OSTree.Repo.new(Gio.File.new_for_path(str(cache_repo_path)))
+    cache_repo.open()
+
+    app_ref = SEED_APP_REF
     _, cache_repo_refs = cache_repo.list_refs(None)
     logger.debug('Cache repo refs: %s', cache_repo_refs)
 
-    manager = eibflatpak.FlatpakManager(
-        local_flatpak_installation,
-        config=flatpak_config,
-    )
-    manager.add_remotes()
-    manager.enumerate_remotes()
-    manager.seed(str(cache_repo_path), cache_repo_refs)
+    flatpak_manager.seed(str(cache_repo_path), cache_repo_refs)
 
     inst_repo = get_installation_repo(local_flatpak_installation)
     _, inst_repo_refs = inst_repo.list_refs(None)
@@ -456,46 +618,25 @@ def test_seed(local_flatpak_installation, flatpak_config, full_remote_flatpak_se
     app_rev = cache_repo_refs[f'origin:{app_ref}']
     assert inst_repo_commits == {app_rev}
 
+    # Seeding again should skip the commit that's already present.
+    caplog.clear()
+    with caplog.at_level(logging.INFO, logger=eibflatpak.__name__):
+        flatpak_manager.seed(str(cache_repo_path), cache_repo_refs)
+    assert f'No commits to seed from {cache_repo_path}' in caplog.text
+
 
 def test_install_seed(local_flatpak_installation, flatpak_config,
-                      full_remote_flatpak_server, tmp_path):
+                      full_remote_flatpak_server, seed_cache_repo_path):
     """Install with seeding from cache repo"""
-    cache_repo_path = tmp_path / 'cache-repo'
+    cache_repo_path = seed_cache_repo_path
     cache_repo_uri = cache_repo_path.as_uri()
     cache_repo = OSTree.Repo.new(Gio.File.new_for_path(str(cache_repo_path)))
-    cache_repo.create(OSTree.RepoMode.ARCHIVE)
+    cache_repo.open()
 
     remote_repo = full_remote_flatpak_server['repo']
     remote_repo_path = full_remote_flatpak_server['path']
-    remote_repo_uri = remote_repo_path.as_uri()
-    app_ref = 'app/com.example.App1/x86_64/master'
+    app_ref = SEED_APP_REF
     locale_ref = 'runtime/com.example.App2.Locale/x86_64/master'
-    run_command((
-        'ostree',
-        f'--repo={cache_repo_path}',
-        'remote',
-        'add',
-        '--no-gpg-verify',
-        'origin',
-        remote_repo_uri,
-    ))
-    run_command((
-        'ostree',
-        f'--repo={cache_repo_path}',
-        'pull',
-        'origin',
-        app_ref,
-    ))
-    run_command((
-        'ostree',
-        f'--repo={cache_repo_path}',
-        'pull',
-        '--subpath=/metadata',
-        '--subpath=/files/en',
-        'origin',
-        locale_ref,
-    ))
-
     _, cache_repo_refs = cache_repo.list_refs(None)
     logger.debug('Cache repo refs: %s', cache_repo_refs)
 
@@ -675,17 +816,18 @@ def test_eol(local_flatpak_installation, flatpak_config, full_remote_flatpak_ser
     repo_path = str(full_remote_flatpak_server['path'])
     ref = 'app/com.example.App1/x86_64/master'
 
-    # Set the old runtime EOL
-    run_command((
+    # Both EOL commits are made in place with the same options.
+    eol_commit_cmd = (
         'flatpak',
         'build-commit-from',
         f'--src-repo={repo_path}',
         f'--gpg-sign={TEST_KEY_IDS["test1"]}',
         f'--gpg-homedir={builder_gpgdir}',
         '--end-of-life=Dead',
-        repo_path,
-        ref,
-    ))
+    )
+
+    # Set the old runtime EOL
+    run_command(eol_commit_cmd + (repo_path, ref))
 
     manager = eibflatpak.FlatpakManager(
         local_flatpak_installation,
@@ -704,13 +846,7 @@ def test_eol(local_flatpak_installation, flatpak_config, full_remote_flatpak_ser
     assert ref in resolved_refs
 
     # Add EOL rebase
-    run_command((
-        'flatpak',
-        'build-commit-from',
-        f'--src-repo={repo_path}',
-        f'--gpg-sign={TEST_KEY_IDS["test1"]}',
-        f'--gpg-homedir={builder_gpgdir}',
-        '--end-of-life=Dead',
+    run_command(eol_commit_cmd + (
         '--end-of-life-rebase=com.example.App1=com.example.App2',
         repo_path,
         ref,
@@ -19,6 +19,7 @@
 import logging
 import os
 import pytest
+import requests
 from urllib.parse import urljoin, urlparse
 
 import eib
@@ -28,6 +29,7 @@ logger = logging.getLogger(__name__)
 
 SERVER_URL = 'https://kolibri.example.com'
 CHANNEL_ID = 'b43aae9d37294548ae75674cd23ddf4a'
+CHANNEL_ID_2 = 'e409be3e4f6e4ce8a50c2ba8c0bd2d71'
 JOB_ID = '1d67e97a98be4eb597b5cdb93e998989'
 
 
@@ -86,11 +88,9 @@ class MockKolibriServer:
                 },
             ]
 
-        self.mocker.get(
-            urljoin(SERVER_URL, f'api/content/channel/{channel_id}/'),
-            status_code=code,
-            json=data,
-        )
+        url = urljoin(SERVER_URL, f'api/content/channel/{channel_id}/')
+        self.mocker.get(url, status_code=code, json=data)
+        self.mocker.head(url, status_code=code)
 
     def set_task_responses(
         self,
@@ -255,9 +255,9 @@ class MockKolibriServer:
             )
             return False
 
-        return any([
+        return any(
             is_update_task_request(req) for req in self.mocker.request_history
-        ])
+        )
 
 
 @pytest.mark.parametrize(
@@ -328,6 +328,66 @@ def test_seed_channel(version, requests_mock):
     assert server.update_tasks_run() is True
 
 
+@pytest.mark.parametrize('exists', [True, False])
+def test_channel_exists(exists, requests_mock):
+    """Test checking channel existence"""
+    server = MockKolibriServer(requests_mock)
+    server.set_channel_response(exists=exists)
+    remote = eibkolibri.RemoteKolibri(SERVER_URL, 'admin', 'admin')
+    assert remote._channel_exists(CHANNEL_ID) is exists
+    last_request = requests_mock.request_history[-1]
+    assert last_request.method == 'HEAD'
+
+    # Servers that don't allow HEAD fall back to GET.
+    requests_mock.head(
+        urljoin(SERVER_URL, f'api/content/channel/{CHANNEL_ID}/'),
+        status_code=405,
+    )
+    assert remote._channel_exists(CHANNEL_ID) is exists
+    last_request = requests_mock.request_history[-1]
+    assert last_request.method == 'GET'
+
+
+def test_channel_exists_error(requests_mock, caplog):
+    """Test channel existence errors are logged and raised"""
+    MockKolibriServer(requests_mock)
+    remote = eibkolibri.RemoteKolibri(SERVER_URL, 'admin', 'admin')
+    requests_mock.head(
+        urljoin(SERVER_URL, f'api/content/channel/{CHANNEL_ID}/'),
+        status_code=500,
+    )
+    with pytest.raises(requests.exceptions.HTTPError):
+        remote._channel_exists(CHANNEL_ID)
+    assert 'Failed to check channel existence: 500' in caplog.text
+
+
+def test_wait_for_job_backoff(requests_mock, monkeypatch):
+    """Test job status polling backs off while the job is stalled"""
+    MockKolibriServer(requests_mock)
+    remote = eibkolibri.RemoteKolibri(SERVER_URL, 'admin', 'admin')
+
+    statuses = [
+        ('RUNNING', 0),
+        ('RUNNING', 0),
+        ('RUNNING', 0),
+        ('RUNNING', 0.5),
+        ('RUNNING', 0.5),
+        ('COMPLETED', 1),
+    ]
+    requests_mock.get(
+        urljoin(SERVER_URL, f'api/tasks/tasks/{JOB_ID}/'),
+        [
+            {'json': {'status': status, 'percentage': percentage}}
+            for status, percentage in statuses
+        ],
+    )
+
+    delays = []
+    monkeypatch.setattr(eibkolibri, 'sleep', delays.append)
+    remote._wait_for_job(JOB_ID, CHANNEL_ID)
+    assert delays == [0.5, 0.75, 1.125, 0.5, 0.75]
+
+
 @pytest.mark.parametrize('version', ['0.15.12', '0.16.0'])
 def test_seed_remote_channels(
     version,
@@ -358,3 +418,29 @@ def test_seed_remote_channels(
     server.set_channel_response(exists=True)
     assert eibkolibri.seed_remote_channels([CHANNEL_ID]) is True
     assert server.update_tasks_run() is True
+
+    # Import one channel and update another. The server version should
+    # only be probed once.
+    requests_mock.reset_mock()
+    server.set_channel_response(channel_id=CHANNEL_ID_2, exists=False)
+    assert eibkolibri.seed_remote_channels([CHANNEL_ID, CHANNEL_ID_2]) is True
+    assert server.update_tasks_run() is True
+    channel_urls = {
+        req.url for req in requests_mock.request_history
+        if '/api/content/channel/' in req.url
+    }
+    assert channel_urls == {
+        urljoin(SERVER_URL, f'api/content/channel/{CHANNEL_ID}/'),
+        urljoin(SERVER_URL, f'api/content/channel/{CHANNEL_ID_2}/'),
+    }
+    info_requests = [
+        req for req in requests_mock.request_history
+        if req.url == urljoin(SERVER_URL, 'api/public/info/')
+    ]
+    assert len(info_requests) == 1
+
+    # A failure seeding one channel is raised.
+    url = urljoin(SERVER_URL, f'api/content/channel/{CHANNEL_ID_2}/')
+    requests_mock.head(url, status_code=500)
+    with pytest.raises(requests.exceptions.HTTPError):
+        eibkolibri.seed_remote_channels([CHANNEL_ID, CHANNEL_ID_2])
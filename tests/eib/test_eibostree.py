@@ -2,9 +2,8 @@
 
 import logging
 import pytest
-import shutil
 
-from ..util import http_server_thread, run_command
+from ..util import http_server_thread
 
 logger = logging.getLogger(__name__)
 
@@ -25,11 +24,6 @@ if HAVE_PREREQS:
         logger.debug('Missing OSTree GI bindings: %s', err)
         HAVE_PREREQS = False
 
-if HAVE_PREREQS:
-    if not shutil.which('ostree'):
-        logger.debug('Missing ostree CLI program')
-        HAVE_PREREQS = False
-
 if not HAVE_PREREQS:
     pytest.skip('Missing eibostree prerequisites', allow_module_level=True)
 
@@ -86,12 +80,7 @@ def test_fetch_remote_collection_id(local_ostree_repo, remote_ostree_server):
     remote_repo.write_config(
         remote_repo.copy_config()
     )
-    run_command([
-        'ostree',
-        f'--repo={remote_ostree_server["path"]}',
-        'summary',
-        '--update',
-    ])
+    remote_repo.regenerate_summary(None, None)
     collection_id = eibostree.fetch_remote_collection_id(
         local_ostree_repo, 'test'
     )
@@ -101,12 +90,7 @@ def test_fetch_remote_collection_id(local_ostree_repo, remote_ostree_server):
     remote_repo.write_config(
         remote_repo.copy_config()
     )
-    run_command([
-        'ostree',
-        f'--repo={remote_ostree_server["path"]}',
-        'summary',
-        '--update',
-    ])
+    remote_repo.regenerate_summary(None, None)
     collection_id = eibostree.fetch_remote_collection_id(
         local_ostree_repo, 'test'
     )
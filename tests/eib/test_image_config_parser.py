@@ -293,19 +293,27 @@ def test_defaults(builder_config):
         builder_config.items(sect)
 
 
-def test_all_current():
-    """Test all current files can be loaded successfully"""
+def get_current_config_files():
+    """Get the relative paths of all current config files"""
     src_configdir = os.path.join(SRCDIR, 'config')
+    paths = []
     for cur, dirs, files in os.walk(src_configdir):
         for name in files:
             if not name.endswith('.ini'):
                 continue
             if name == 'local.ini':
                 continue
-            path = os.path.join(cur, name)
-            config = eib.ImageConfigParser()
-            assert config.read_config_file(path, path.replace('/', '_'))
-            assert get_combined_ini(config) != ''
+            paths.append(os.path.relpath(os.path.join(cur, name), SRCDIR))
+    return sorted(paths)
+
+
+@pytest.mark.parametrize('relpath', get_current_config_files())
+def test_all_current(relpath):
+    """Test all current files can be loaded successfully"""
+    path = os.path.join(SRCDIR, relpath)
+    config = eib.ImageConfigParser()
+    assert config.read_config_file(path, path.replace('/', '_'))
+    assert get_combined_ini(config) != ''
 
 
 def test_environment_variables(config):
@@ -89,9 +89,9 @@ def test_bad_arch(make_builder):
 # variants + some typical custom variants. Configurations with master
 # and the latest stable branch are tested.
 STABLE_BRANCH = sorted(
-    filter(lambda b: b != 'master',
-           map(lambda c: c.replace('.ini', ''),
-               os.listdir(os.path.join(SRCDIR, 'config/branch'))))
+    name[:-len('.ini')]
+    for name in os.listdir(os.path.join(SRCDIR, 'config/branch'))
+    if name.endswith('.ini') and name != 'master.ini'
 )[-1]
 RELEASE_TARGETS = [
     'eos-amd64-amd64-base',
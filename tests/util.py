@@ -1,7 +1,7 @@
 # Test utilities and common settings
 
 from contextlib import contextmanager
-from functools import partial
+from functools import lru_cache, partial
 from http.server import SimpleHTTPRequestHandler
 import importlib.machinery
 import importlib.util
@@ -38,7 +38,16 @@ TEST_KEY_IDS = {
 
 
 def import_script(name, script):
-    """Import a script as a module"""
+    """Import a script as a module
+
+    The module is cached so that importing the same script from
+    multiple test modules only executes it once.
+    """
+    return _import_script(name, os.path.realpath(script))
+
+
+@lru_cache(maxsize=None)
+def _import_script(name, script):
     spec = importlib.util.spec_from_loader(
         name,
         importlib.machinery.SourceFileLoader(name, script)